@@ -1,21 +1,45 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import BaseModel, Field
+from typing import Literal
+from contextlib import asynccontextmanager
 import os
+import time
 import uuid
+import shutil
+import math
 import asyncio
+import functools
 from dotenv import load_dotenv
 
 # Import services
 from .services.scraper import ScraperService
 from .services.analyzer import AnalyzerService
-from .services.video_generator import VideoGeneratorService
+from .services.video_generator import VideoGeneratorService, DEFAULT_PREVIEW_TEXT
+from .services.asset_store import AssetStoreService
+from .services.retention import RetentionService, shard_dir
+from .services.thumbnails import ThumbnailService
+from .services.admission import AdmissionController, AdmissionRejected
+from .services.page_cache import PageCacheService
+from .responses import serve_file, cached_json, file_etag
 
 # Load environment variables
 load_dotenv(dotenv_path="../.env")
 
-app = FastAPI(title="AutoRead API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background = [
+        asyncio.create_task(sweep_storage_periodically()),
+        asyncio.create_task(warm_up())
+    ]
+    if os.getenv("TTS_PREWARM_PREVIEWS", "").lower() in ("1", "true", "yes"):
+        background.append(asyncio.create_task(video_generator_service.prewarm_previews()))
+    yield
+    for job in background:
+        job.cancel()
+
+app = FastAPI(title="AutoRead API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -28,6 +52,8 @@ app.add_middleware(
 
 # In-memory storage
 tasks = {}
+# task_id -> asyncio.Task running its pipeline, used for cancellation
+running_tasks: dict[str, asyncio.Task] = {}
 
 # Models
 class LLMConfig(BaseModel):
@@ -35,6 +61,15 @@ class LLMConfig(BaseModel):
     model: str | None = None
     api_key: str | None = None
 
+# Bounded so a single request cannot ask for an arbitrarily expensive encode
+X264_PRESETS = Literal["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"]
+
+class RenderConfig(BaseModel):
+    width: int | None = Field(default=None, gt=0, le=3840, multiple_of=2)
+    height: int | None = Field(default=None, gt=0, le=3840, multiple_of=2)
+    fps: int | None = Field(default=None, gt=0, le=60)
+    preset: X264_PRESETS | None = None
+
 class ProcessRequest(BaseModel):
     url: str
     user_id: str | None = None
@@ -42,6 +77,14 @@ class ProcessRequest(BaseModel):
     chapters: list[str] | None = None
     voice: str | None = None
     word_count: int | None = 1000
+    render: RenderConfig | None = None
+
+class RegenerateRequest(BaseModel):
+    llm: LLMConfig | None = None
+    chapters: list[str] | None = None
+    voice: str | None = None
+    word_count: int | None = None
+    render: RenderConfig | None = None
 
 class ExtractChaptersRequest(BaseModel):
     url: str
@@ -51,69 +94,311 @@ class VoicePreviewRequest(BaseModel):
     text: str | None = None
 
 # Services initialization
-scraper_service = ScraperService()
+asset_store_service = AssetStoreService()
+page_cache_service = PageCacheService()
+scraper_service = ScraperService(asset_store=asset_store_service, page_cache=page_cache_service)
 analyzer_service = AnalyzerService()
 video_generator_service = VideoGeneratorService()
+retention_service = RetentionService(asset_store=asset_store_service)
+thumbnail_service = ThumbnailService()
+admission_controller = AdmissionController()
+
+async def sweep_storage_periodically():
+    while True:
+        active = set()
+        for tid, t in tasks.items():
+            if t["status"] in ("pending", "processing"):
+                active.add(tid)
+                # A regeneration still reads the artifacts of the task it started from
+                if t["meta"].get("plan"):
+                    active.add(t["meta"]["plan"]["source_task_id"])
+        try:
+            freed = await asyncio.to_thread(retention_service.sweep, active)
+            if freed:
+                print(f"Storage sweep freed {freed} bytes")
+        except Exception as e:
+            print(f"Storage sweep failed: {e}")
+        await asyncio.sleep(retention_service.sweep_interval)
+
+# Reported by /ready; checks map to "ok" or the error the warm-up step raised
+warmup_state = {"ready": False, "duration_ms": None, "checks": {}}
+# Checks without a fallback: the browser falls back to requests, the LLM to a mock summary
+# and TTS to silent audio, rendering has none
+REQUIRED_CHECKS = ["ffmpeg"]
+WARMUP_CHECK_TIMEOUT = float(os.getenv("WARMUP_CHECK_TIMEOUT_SEC") or 60)
+
+async def warm_up():
+    """Loads heavy dependencies in the background so the first task does not pay for them."""
+    started = time.perf_counter()
+
+    async def check(name: str, coro):
+        try:
+            await asyncio.wait_for(coro, WARMUP_CHECK_TIMEOUT)
+            warmup_state["checks"][name] = "ok"
+        except asyncio.TimeoutError:
+            warmup_state["checks"][name] = f"error: timed out after {WARMUP_CHECK_TIMEOUT:.0f}s"
+            print(f"Warm-up of {name} timed out")
+        except Exception as e:
+            warmup_state["checks"][name] = f"error: {e}"
+            print(f"Warm-up of {name} failed: {e}")
+
+    await asyncio.gather(
+        check("browser", scraper_service.warm_up()),
+        check("llm", analyzer_service.warm_up()),
+        check("tts", video_generator_service.warm_up_tts()),
+        check("ffmpeg", video_generator_service.warm_up())
+    )
+    warmup_state["duration_ms"] = int((time.perf_counter() - started) * 1000)
+    warmup_state["ready"] = True
+
+# Pipeline stages in execution order; regeneration re-runs a suffix of this list
+PIPELINE_STAGES = ["scrape", "analyze", "tts", "render"]
+# Request field -> first stage whose output depends on it
+STAGE_INPUTS = {"llm": "analyze", "chapters": "analyze", "word_count": "analyze", "voice": "tts", "render": "render"}
+# Per-stage deadlines in seconds, overridable with STAGE_DEADLINE_<STAGE>_SEC
+STAGE_DEADLINES = {
+    stage: float(os.getenv(f"STAGE_DEADLINE_{stage.upper()}_SEC") or default)
+    for stage, default in {"scrape": 180, "analyze": 240, "tts": 180, "render": 1200}.items()
+}
+# Stage -> task result key holding the artifact a skipped stage hands to the next one
+STAGE_OUTPUTS = {"scrape": "source_path", "analyze": "article_path", "tts": "audio_path", "render": "video_path"}
+
+def article_file_path(task_id: str, suffix: str):
+    return os.path.join(shard_dir(os.path.join("storage", "articles"), task_id), f"{task_id}{suffix}")
+
+def reuse_file(src: str, dst: str):
+    """Hard-links (or copies) an artifact of an earlier task so each task owns its files."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+def read_source_markdown(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        header, _, body = f.read().partition("\n\n## Extracted Content\n\n")
+    return header.removeprefix("# ").strip(), body.rstrip("\n")
+
+def read_article_body(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().partition("\n\n")[2]
+
+def plan_regeneration(origin: dict, params: dict):
+    """Returns (stages to run, stages skipped) for re-running `origin` with new params."""
+    previous = origin.get("params") or {}
+    first = len(PIPELINE_STAGES)
+    for field, stage in STAGE_INPUTS.items():
+        if params.get(field) != previous.get(field):
+            first = min(first, PIPELINE_STAGES.index(stage))
+    # Fall back to an earlier stage when an artifact we would reuse is gone
+    for i, stage in enumerate(PIPELINE_STAGES[:first]):
+        path = origin["result"].get(STAGE_OUTPUTS[stage])
+        if not path or not os.path.exists(path):
+            first = i
+            break
+    return PIPELINE_STAGES[first:], PIPELINE_STAGES[:first]
+
+async def run_stage(stage: str, coro):
+    try:
+        return await asyncio.wait_for(coro, STAGE_DEADLINES[stage])
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Stage '{stage}' exceeded its {STAGE_DEADLINES[stage]:.0f}s deadline")
+
+def discard_task_artifacts(task_id: str):
+    """Removes every file a task has written so far and drops its asset references."""
+    result = tasks[task_id]["result"]
+    paths = [result.get(key) for key in STAGE_OUTPUTS.values()]
+    paths += [article_file_path(task_id, ".source.md"), article_file_path(task_id, ".md")]
+    audio_dir = shard_dir(video_generator_service.audio_dir, task_id)
+    paths += [os.path.join(audio_dir, f"{task_id}.mp3"), os.path.join(audio_dir, f"{task_id}.wav")]
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+    video_generator_service.discard_render_output(os.path.join(shard_dir(video_generator_service.videos_dir, task_id), f"{task_id}.mp4"))
+    asset_store_service.release_task(task_id)
+    asset_store_service.collect_garbage()
+    for key in STAGE_OUTPUTS.values():
+        result[key] = None
+    result["images"] = []
+    result["screenshots"] = []
+    result["visuals_used"] = []
+    update_task(tasks[task_id])
+
+def start_pipeline(task_id: str, stages: list[str] | None = None, reuse_from: str | None = None):
+    running = asyncio.create_task(run_admitted(task_id, stages, reuse_from))
+    running_tasks[task_id] = running
+    running.add_done_callback(lambda _: running_tasks.pop(task_id, None))
+
+def client_address(http_request: Request):
+    return http_request.client.host if http_request.client else "anonymous"
+
+def admit_user(user: str, client: str):
+    try:
+        admission_controller.admit(user, client)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+def update_task(task: dict, **fields):
+    """Applies field changes and bumps the version that status and asset ETags are derived from."""
+    task.update(fields)
+    task["version"] += 1
+
+def create_task(params: dict, user: str):
+    task_id = str(uuid.uuid4())
+    tasks[task_id] = {
+        "id": task_id,
+        "url": params["url"],
+        "user": user,
+        "status": "pending",
+        "progress": 0,
+        "message": "Task created",
+        "version": 0,
+        "params": params,
+        "meta": {
+            "llm": None,
+            "tts": None,
+            "plan": None
+        },
+        "result": {
+            "article_path": None,
+            "video_path": None,
+            "source_path": None,
+            "audio_path": None,
+            "images": [],
+            "screenshots": [],
+            "visuals_used": []
+        }
+    }
+    return task_id
+
+async def run_admitted(task_id: str, stages: list[str] | None = None, reuse_from: str | None = None):
+    """Waits for a fair pipeline slot for the task's user, then runs the pipeline."""
+    user = tasks[task_id]["user"]
+    update_task(tasks[task_id], message="Waiting in queue...")
+    try:
+        await admission_controller.acquire(user)
+    except asyncio.CancelledError:
+        update_task(tasks[task_id], status="cancelled", message="Task cancelled")
+        raise
+    try:
+        await process_task(task_id, stages, reuse_from)
+    finally:
+        admission_controller.release(user)
 
-async def process_task(task_id: str, url: str, llm: dict | None, chapters: list[str] | None = None, voice: str | None = None, word_count: int = 1000):
+async def process_task(task_id: str, stages: list[str] | None = None, reuse_from: str | None = None):
+    task = tasks[task_id]
+    params = task["params"]
+    result = task["result"]
+    # An empty plan is a pure reuse of `reuse_from`, not a full run
+    stages = PIPELINE_STAGES if stages is None else stages
     try:
+        origin = None
+        if reuse_from:
+            origin = tasks.get(reuse_from)
+            if origin is None:
+                raise RuntimeError(f"Source task {reuse_from} no longer exists")
+        update_task(task, status="processing")
+
         # 1. Scraping
-        tasks[task_id]["status"] = "processing"
-        tasks[task_id]["progress"] = 10
-        tasks[task_id]["message"] = "Scraping web content..."
-        
-        scrape_result = await scraper_service.scrape_url(url, task_id)
-
-        source_path = os.path.join("storage", "articles", f"{task_id}.source.md")
-        os.makedirs(os.path.dirname(source_path), exist_ok=True)
-        with open(source_path, "w", encoding="utf-8") as f:
-            f.write(f"# {scrape_result['title']}\n\n## Extracted Content\n\n{scrape_result['content']}\n")
-        tasks[task_id]["result"]["source_path"] = source_path
-        tasks[task_id]["result"]["images"] = scrape_result.get("images") or []
-        tasks[task_id]["result"]["screenshots"] = scrape_result.get("screenshots") or []
+        if "scrape" in stages:
+            update_task(task, progress=10, message="Scraping web content...")
+            
+            scrape_result = await run_stage("scrape", scraper_service.scrape_url(params["url"], task_id))
+            title, content = scrape_result["title"], scrape_result["content"]
+
+            source_path = article_file_path(task_id, ".source.md")
+            os.makedirs(os.path.dirname(source_path), exist_ok=True)
+            with open(source_path, "w", encoding="utf-8") as f:
+                f.write(f"# {title}\n\n## Extracted Content\n\n{content}\n")
+            result["source_path"] = source_path
+            result["images"] = scrape_result.get("images") or []
+            result["screenshots"] = scrape_result.get("screenshots") or []
+            update_task(task)
+            await asyncio.to_thread(thumbnail_service.generate_all, result["images"] + result["screenshots"])
+            if scrape_result.get("unchanged"):
+                # Unchanged page and the same settings as an earlier run: reuse its outputs wholesale
+                previous = page_cache_service.find_outputs(params["url"], page_cache_service.fingerprint(params))
+                if previous:
+                    origin = previous
+                    stages = ["scrape"]
+                    task["meta"]["plan"] = {"source_task_id": previous["task_id"], "stages": stages, "skipped": PIPELINE_STAGES[1:], "reason": "unchanged"}
+        else:
+            update_task(task, progress=10, message="Reusing scraped content...")
+            result["source_path"] = reuse_file(origin["result"]["source_path"], article_file_path(task_id, ".source.md"))
+            title, content = read_source_markdown(result["source_path"])
+            if asset_store_service.has_manifest(reuse_from):
+                manifest = await asyncio.to_thread(asset_store_service.copy_task, reuse_from, task_id)
+                result["images"] = [e["path"] for e in manifest if e["type"] == "images"]
+                result["screenshots"] = [e["path"] for e in manifest if e["type"] == "screenshots"]
+            else:
+                result["images"] = list(origin["result"].get("images") or [])
+                result["screenshots"] = list(origin["result"].get("screenshots") or [])
+        images, screenshots = result["images"], result["screenshots"]
         
         # 2. Analyzing
-        tasks[task_id]["progress"] = 40
-        tasks[task_id]["message"] = "Analyzing content with AI..."
-        
-        summary_text, llm_meta = await analyzer_service.analyze_content(scrape_result["content"], llm=llm, chapters=chapters, word_count=word_count)
-        tasks[task_id]["meta"]["llm"] = llm_meta
-        
-        # Save article
-        article_path = os.path.join("storage", "articles", f"{task_id}.md")
-        os.makedirs(os.path.dirname(article_path), exist_ok=True)
-        with open(article_path, "w", encoding="utf-8") as f:
-            f.write(f"# {scrape_result['title']}\n\n{summary_text}")
+        article_path = article_file_path(task_id, ".md")
+        if "analyze" in stages:
+            update_task(task, progress=40, message="Analyzing content with AI...")
+            
+            summary_text, llm_meta = await run_stage("analyze", analyzer_service.analyze_content(content, llm=params["llm"], chapters=params["chapters"], word_count=params["word_count"]))
+            task["meta"]["llm"] = llm_meta
             
-        tasks[task_id]["result"]["article_path"] = article_path
+            # Save article
+            os.makedirs(os.path.dirname(article_path), exist_ok=True)
+            with open(article_path, "w", encoding="utf-8") as f:
+                f.write(f"# {title}\n\n{summary_text}")
+        else:
+            reuse_file(origin["result"]["article_path"], article_path)
+            summary_text = read_article_body(article_path)
+            task["meta"]["llm"] = origin["meta"].get("llm")
+        result["article_path"] = article_path
         
-        # 3. Generating Video
-        tasks[task_id]["progress"] = 70
-        tasks[task_id]["message"] = "Generating video..."
+        # 3. Synthesizing narration
+        if "tts" in stages:
+            update_task(task, progress=70, message="Synthesizing narration...")
+            speech = await run_stage("tts", video_generator_service.synthesize_speech(summary_text, task_id, voice=params["voice"]))
+            result["audio_path"] = speech["audio_path"]
+            task["meta"]["tts"] = {
+                "voice": speech["voice"],
+                "audio_fallback": speech["audio_fallback"]
+            }
+        else:
+            origin_audio = origin["result"].get("audio_path")
+            if origin_audio and os.path.exists(origin_audio):
+                result["audio_path"] = reuse_file(origin_audio, os.path.join(shard_dir(video_generator_service.audio_dir, task_id), f"{task_id}{os.path.splitext(origin_audio)[1]}"))
+            task["meta"]["tts"] = origin["meta"].get("tts")
         
-        video_result = await video_generator_service.generate_video(
-            summary_text, 
-            scrape_result.get("images") or [],
-            scrape_result["screenshots"], 
-            task_id,
-            voice=voice
-        )
+        # 4. Rendering video
+        if "render" in stages:
+            update_task(task, progress=85, message="Generating video...")
+            video_path = await run_stage("render", video_generator_service.render_video(result["audio_path"], images, screenshots, task_id, render=params["render"]))
+        else:
+            video_path = reuse_file(origin["result"]["video_path"], os.path.join(shard_dir(video_generator_service.videos_dir, task_id), f"{task_id}.mp4"))
         
-        tasks[task_id]["result"]["video_path"] = video_result["video_path"]
-        tasks[task_id]["result"]["visuals_used"] = scrape_result.get("images") or scrape_result.get("screenshots") or []
-        tasks[task_id]["meta"]["tts"] = {
-            "voice": video_result.get("voice"),
-            "audio_fallback": video_result.get("audio_fallback", False)
-        }
+        result["video_path"] = video_path
+        result["visuals_used"] = images or screenshots
+        
+        # Never offer a mock summary or a silent fallback video for reuse; a later run can do better
+        if (task["meta"].get("llm") or {}).get("enabled") and not (task["meta"].get("tts") or {}).get("audio_fallback"):
+            page_cache_service.record_outputs(params["url"], page_cache_service.fingerprint(params), task_id, result, task["meta"])
         
         # Complete
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["progress"] = 100
-        tasks[task_id]["message"] = "Task completed successfully!"
+        update_task(task, status="completed", progress=100, message="Task completed successfully!")
         
+    except asyncio.CancelledError:
+        await asyncio.to_thread(discard_task_artifacts, task_id)
+        update_task(task, status="cancelled", message="Task cancelled")
+        raise
+    except TimeoutError as e:
+        # Free the space a stalled task has taken right away instead of waiting for retention
+        await asyncio.to_thread(discard_task_artifacts, task_id)
+        update_task(task, status="failed", message=f"Error: {str(e)}")
+        print(f"Task {task_id} failed: {e}")
     except Exception as e:
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["message"] = f"Error: {str(e)}"
+        update_task(task, status="failed", message=f"Error: {str(e)}")
         print(f"Task {task_id} failed: {e}")
 
 @app.get("/")
@@ -124,6 +409,15 @@ def read_root():
 def health():
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    if not warmup_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up", "checks": warmup_state["checks"]})
+    failed = [name for name in REQUIRED_CHECKS if warmup_state["checks"].get(name) != "ok"]
+    if failed:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "failed": failed, "duration_ms": warmup_state["duration_ms"], "checks": warmup_state["checks"]})
+    return {"status": "ready", "duration_ms": warmup_state["duration_ms"], "checks": warmup_state["checks"]}
+
 @app.post("/api/extract-chapters")
 async def extract_chapters(request: ExtractChaptersRequest):
     try:
@@ -139,67 +433,130 @@ async def get_voices():
 @app.post("/api/tts/preview")
 async def preview_voice(request: VoicePreviewRequest):
     try:
-        text = request.text or "你好，这是 Auto Read 的试听片段。祝您使用愉快！"
+        text = request.text or DEFAULT_PREVIEW_TEXT
         path = await video_generator_service.generate_preview(request.voice, text)
         return FileResponse(path, media_type="audio/mpeg")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/process")
-async def process_url(request: ProcessRequest, background_tasks: BackgroundTasks):
-    task_id = str(uuid.uuid4())
-    tasks[task_id] = {
-        "id": task_id,
-        "url": request.url,
-        "status": "pending",
-        "progress": 0,
-        "message": "Task created",
-        "meta": {
-            "llm": None,
-            "tts": None
-        },
-        "result": {
-            "article_path": None,
-            "video_path": None,
-            "source_path": None,
-            "images": [],
-            "screenshots": [],
-            "visuals_used": []
-        }
-    }
-    
+async def process_url(request: ProcessRequest, http_request: Request):
+    client = client_address(http_request)
+    # user_id is client-supplied, so it only partitions the limits of the address it comes from
+    user = f"{client}/{request.user_id}" if request.user_id else client
+    admit_user(user, client)
+
     llm = request.llm.model_dump() if request.llm else None
     if llm and not llm.get("api_key"):
         llm.pop("api_key", None)
     
-    word_count = request.word_count or 1000
-    background_tasks.add_task(process_task, task_id, request.url, llm, request.chapters, request.voice, word_count)
+    task_id = create_task({
+        "url": request.url,
+        "llm": llm,
+        "chapters": request.chapters,
+        "voice": request.voice,
+        "word_count": request.word_count or 1000,
+        "render": request.render.model_dump() if request.render else None
+    }, user)
+    start_pipeline(task_id)
     
     return {"task_id": task_id, "status": "pending", "message": "Task started"}
 
+@app.post("/api/task/{task_id}/regenerate")
+async def regenerate_task(task_id: str, request: RegenerateRequest, http_request: Request):
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    origin = tasks[task_id]
+    if origin["status"] != "completed":
+        raise HTTPException(status_code=400, detail="Task not completed yet")
+
+    params = dict(origin["params"])
+    if request.llm:
+        # Merge so that changing e.g. only the model keeps the original base_url and api_key
+        llm = dict(origin["params"].get("llm") or {})
+        llm.update({k: v for k, v in request.llm.model_dump().items() if v})
+        params["llm"] = llm
+    if request.chapters is not None:
+        params["chapters"] = request.chapters
+    if request.voice:
+        params["voice"] = request.voice
+    if request.word_count:
+        params["word_count"] = request.word_count
+    if request.render:
+        params["render"] = request.render.model_dump()
+
+    stages, skipped = plan_regeneration(origin, params)
+    admit_user(origin["user"], client_address(http_request))
+    new_task_id = create_task(params, origin["user"])
+    plan = {"source_task_id": task_id, "stages": stages, "skipped": skipped}
+    tasks[new_task_id]["meta"]["plan"] = plan
+    update_task(tasks[new_task_id])
+    start_pipeline(new_task_id, stages, task_id)
+
+    return {"task_id": new_task_id, "status": "pending", "message": "Task started", **plan}
+
+@app.delete("/api/task/{task_id}")
+async def delete_task(task_id: str):
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    running = running_tasks.get(task_id)
+    if running is not None:
+        # The pipeline cleans up its own partial artifacts when cancelled
+        running.cancel()
+        try:
+            await running
+        except asyncio.CancelledError:
+            pass
+        return {"task_id": task_id, "status": "cancelled"}
+
+    dependents = [tid for tid, t in tasks.items() if t["status"] in ("pending", "processing") and (t["meta"].get("plan") or {}).get("source_task_id") == task_id]
+    if dependents:
+        raise HTTPException(status_code=409, detail=f"Task is being reused by {', '.join(dependents)}")
+
+    await asyncio.to_thread(discard_task_artifacts, task_id)
+    tasks.pop(task_id, None)
+    return {"task_id": task_id, "status": "deleted"}
+
+# Status field -> how to read it from a task; ?fields= selects a subset for cheap polling
+STATUS_FIELDS = {
+    "status": lambda task: task["status"],
+    "progress": lambda task: task["progress"],
+    "message": lambda task: task["message"],
+    "has_article": lambda task: bool(task["result"]["article_path"]),
+    "has_video": lambda task: bool(task["result"]["video_path"]),
+    "has_source": lambda task: bool(task["result"].get("source_path")),
+    "image_count": lambda task: len(task["result"].get("images") or []),
+    "screenshot_count": lambda task: len(task["result"].get("screenshots") or []),
+    "visual_count": lambda task: len(task["result"].get("visuals_used") or []),
+    "llm": lambda task: task.get("meta", {}).get("llm"),
+    "tts": lambda task: task.get("meta", {}).get("tts"),
+    "plan": lambda task: task.get("meta", {}).get("plan")
+}
+
+@functools.lru_cache(maxsize=int(os.getenv("MARKDOWN_CACHE_SIZE") or 128))
+def read_markdown(path: str, etag: str):
+    """Markdown files never change in place, so (path, etag) is a safe cache key."""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
 @app.get("/api/status/{task_id}")
-def get_status(task_id: str):
+async def get_status(request: Request, task_id: str, fields: str | None = None):
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
     
     task = tasks[task_id]
-    return {
-        "task_id": task["id"],
-        "status": task["status"],
-        "progress": task["progress"],
-        "message": task["message"],
-        "has_article": bool(task["result"]["article_path"]),
-        "has_video": bool(task["result"]["video_path"]),
-        "has_source": bool(task["result"].get("source_path")),
-        "image_count": len(task["result"].get("images") or []),
-        "screenshot_count": len(task["result"].get("screenshots") or []),
-        "visual_count": len(task["result"].get("visuals_used") or []),
-        "llm": task.get("meta", {}).get("llm"),
-        "tts": task.get("meta", {}).get("tts")
-    }
+    selected = list(STATUS_FIELDS)
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        if any(f not in STATUS_FIELDS for f in selected):
+            raise HTTPException(status_code=400, detail="Invalid status field")
+    etag = f'"{task["version"]}-{"+".join(selected)}"' if fields else f'"{task["version"]}"'
+    return cached_json(request, etag, lambda: {"task_id": task["id"], **{f: STATUS_FIELDS[f](task) for f in selected}})
 
 @app.get("/api/task/{task_id}/markdown/{kind}")
-def get_markdown(task_id: str, kind: str):
+def get_markdown(request: Request, task_id: str, kind: str, raw: bool = False):
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -214,26 +571,42 @@ def get_markdown(task_id: str, kind: str):
     if not path or not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Markdown not found")
 
-    with open(path, "r", encoding="utf-8") as f:
-        return {"task_id": task_id, "kind": kind, "markdown": f.read()}
+    if raw:
+        # Plain text/markdown with Range support for large articles
+        return serve_file(request, path, media_type="text/markdown; charset=utf-8", cache_control="no-cache")
+
+    etag = file_etag(os.stat(path))
+    return cached_json(request, etag, lambda: {"task_id": task_id, "kind": kind, "markdown": read_markdown(path, etag)})
 
 @app.get("/api/task/{task_id}/assets")
-def get_assets(task_id: str):
+def get_assets(request: Request, task_id: str):
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
 
     task = tasks[task_id]
+    return cached_json(request, f'"{task["version"]}"', lambda: build_assets(task_id, task))
+
+def build_assets(task_id: str, task: dict):
+    manifest = asset_store_service.get_manifest(task_id)
 
     def to_urls(paths: list[str], asset_type: str):
+        if manifest:
+            names = [e["name"] for e in manifest if e["type"] == asset_type]
+        else:
+            names = [os.path.basename(p) for p in paths or []]
         items = []
-        for p in paths or []:
-            name = os.path.basename(p)
-            items.append({"name": name, "url": f"/api/task/{task_id}/asset/{asset_type}/{name}"})
+        for name in names:
+            url = f"/api/task/{task_id}/asset/{asset_type}/{name}"
+            items.append({"name": name, "url": url, "thumb_url": f"{url}?size=thumb", "preview_url": f"{url}?size=preview"})
         return items
 
     images = to_urls(task["result"].get("images") or [], "images")
     screenshots = to_urls(task["result"].get("screenshots") or [], "screenshots")
-    visuals_used = sorted(set(os.path.basename(p) for p in (task["result"].get("visuals_used") or [])))
+    used_paths = set(task["result"].get("visuals_used") or [])
+    if manifest:
+        visuals_used = sorted(set(e["name"] for e in manifest if e["path"] in used_paths))
+    else:
+        visuals_used = sorted(set(os.path.basename(p) for p in used_paths))
 
     return {
         "task_id": task_id,
@@ -243,21 +616,28 @@ def get_assets(task_id: str):
     }
 
 @app.get("/api/task/{task_id}/asset/{asset_type}/{filename}")
-def get_asset(task_id: str, asset_type: str, filename: str):
+def get_asset(request: Request, task_id: str, asset_type: str, filename: str, size: str = "original"):
     if asset_type not in {"images", "screenshots"}:
         raise HTTPException(status_code=400, detail="Invalid asset type")
+    if size != "original" and size not in ThumbnailService.SIZES:
+        raise HTTPException(status_code=400, detail="Invalid asset size")
 
     filename = os.path.basename(filename)
-    base_dir = os.path.join("storage", asset_type, task_id)
-    path = os.path.join(base_dir, filename)
+    path = asset_store_service.resolve(task_id, asset_type, filename)
+    if path is None:
+        # Tasks created before the blob store kept per-task copies
+        path = os.path.join("storage", asset_type, os.path.basename(task_id), filename)
 
     if not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Asset not found")
 
-    return FileResponse(path)
+    retention_service.touch(task_id)
+    path = thumbnail_service.get(path, size)
+    # Blobs are content-addressed, so a name always maps to the same bytes
+    return serve_file(request, path, cache_control="public, max-age=86400")
 
 @app.get("/api/download/{file_type}/{task_id}")
-def download_file(file_type: str, task_id: str):
+def download_file(request: Request, file_type: str, task_id: str):
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
         
@@ -278,5 +658,6 @@ def download_file(file_type: str, task_id: str):
         
     if not path or not os.path.exists(path):
         raise HTTPException(status_code=404, detail="File not found")
-        
-    return FileResponse(path, media_type=media_type, filename=filename)
+
+    retention_service.touch(task_id)
+    return serve_file(request, path, media_type=media_type, filename=filename)
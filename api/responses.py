@@ -0,0 +1,30 @@
+import os
+from fastapi import Request
+from fastapi.responses import FileResponse, JSONResponse, Response
+
+def file_etag(stat_result: os.stat_result):
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+def etag_matches(request: Request, etag: str):
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def not_modified(etag: str, cache_control: str):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def cached_json(request: Request, etag: str, build, cache_control: str = "no-cache"):
+    """Answers If-None-Match with 304 before building the JSON body at all."""
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    return JSONResponse(build(), headers={"ETag": etag, "Cache-Control": cache_control})
+
+def serve_file(request: Request, path: str, media_type: str | None = None, filename: str | None = None, cache_control: str = "public, max-age=3600"):
+    """FileResponse with our ETag, If-None-Match and Cache-Control; Starlette handles Range and If-Range."""
+    stat_result = os.stat(path)
+    etag = file_etag(stat_result)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    return FileResponse(path, media_type=media_type, filename=filename, headers={"ETag": etag, "Cache-Control": cache_control}, stat_result=stat_result)
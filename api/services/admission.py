@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Consumes one token; returns 0 on success or the seconds until one is available."""
+        wait = self.wait_time()
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+    def wait_time(self):
+        """Seconds until a token is available, without consuming it."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    @property
+    def full(self):
+        """A full bucket behaves exactly like a new one, so it can be dropped."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+class AdmissionController:
+    """Bounds pipeline concurrency globally and per user, and schedules users round-robin.
+
+    `admit` runs in the request handler and rejects work that would exceed a
+    rate or queue limit. `acquire` waits for a pipeline slot; free slots go to
+    users in turn, so one bulk submitter cannot starve everyone else.
+
+    User ids are chosen by the client, so every limit is also enforced per
+    client address, scaled by ADMISSION_USERS_PER_CLIENT; minting new ids does
+    not buy a client more than that.
+    """
+
+    def __init__(self):
+        self.max_in_flight = int(os.getenv("ADMISSION_MAX_IN_FLIGHT") or 4)
+        self.max_queued = int(os.getenv("ADMISSION_MAX_QUEUED") or 100)
+        self.user_max_concurrent = int(os.getenv("ADMISSION_USER_MAX_CONCURRENT") or 2)
+        self.user_max_queued = int(os.getenv("ADMISSION_USER_MAX_QUEUED") or 10)
+        self.user_rate = float(os.getenv("ADMISSION_USER_RATE_PER_MIN") or 10) / 60.0
+        self.user_burst = float(os.getenv("ADMISSION_USER_BURST") or 5)
+        self.retry_after = float(os.getenv("ADMISSION_RETRY_AFTER_SEC") or 15)
+        self.users_per_client = int(os.getenv("ADMISSION_USERS_PER_CLIENT") or 4)
+        self.in_flight = 0
+        self._running: dict[str, int] = {}
+        self._admitted: dict[str, int] = {}
+        self._waiters: dict[str, deque] = {}
+        self._rotation: deque = deque()
+        self._buckets: dict[str, TokenBucket] = {}
+        # user -> client address it was admitted from, and the same counters per client
+        self._client_of: dict[str, str] = {}
+        self._client_running: dict[str, int] = {}
+        self._client_admitted: dict[str, int] = {}
+        self._client_buckets: dict[str, TokenBucket] = {}
+        self._last_eviction = time.monotonic()
+
+    @property
+    def queued(self):
+        return sum(len(q) for q in self._waiters.values())
+
+    def admit(self, user: str, client: str | None = None):
+        """Reserves a place for one task of `user`, sent from `client`, or raises AdmissionRejected."""
+        client = self._client_of.get(user) or client or user
+        if self._admitted.get(user, 0) >= self.user_max_queued:
+            raise AdmissionRejected("Too many tasks for this user", self.retry_after)
+        if self._client_admitted.get(client, 0) >= self.user_max_queued * self.users_per_client:
+            raise AdmissionRejected("Too many tasks from this client", self.retry_after)
+        if self.in_flight >= self.max_in_flight and self.queued >= self.max_queued:
+            raise AdmissionRejected("Server is busy", self.retry_after)
+        self._evict_idle_buckets()
+        buckets = [
+            self._bucket(self._buckets, user, 1),
+            self._bucket(self._client_buckets, client, self.users_per_client)
+        ]
+        wait = max(bucket.wait_time() for bucket in buckets)
+        if wait:
+            raise AdmissionRejected("Rate limit exceeded", wait)
+        for bucket in buckets:
+            bucket.take()
+        self._admitted[user] = self._admitted.get(user, 0) + 1
+        self._client_admitted[client] = self._client_admitted.get(client, 0) + 1
+        self._client_of[user] = client
+
+    async def acquire(self, user: str):
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._waiters.setdefault(user, deque())
+        queue.append(waiter)
+        if user not in self._rotation:
+            self._rotation.append(user)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we were cancelled
+                self.release(user)
+            else:
+                self._forget_waiter(user, waiter)
+                self._drop_admission(user)
+            raise
+
+    def release(self, user: str):
+        self.in_flight = max(0, self.in_flight - 1)
+        self._decrement(self._running, user)
+        self._decrement(self._client_running, self._client_of.get(user, user))
+        self._drop_admission(user)
+        self._dispatch()
+
+    def _dispatch(self):
+        checked = 0
+        while self.in_flight < self.max_in_flight and self._rotation and checked < len(self._rotation):
+            user = self._rotation[0]
+            self._rotation.rotate(-1)
+            queue = self._waiters.get(user)
+            if not queue:
+                self._rotation.remove(user)
+                self._waiters.pop(user, None)
+                checked = 0
+                continue
+            client = self._client_of.get(user, user)
+            if self._running.get(user, 0) >= self.user_max_concurrent or self._client_running.get(client, 0) >= self.user_max_concurrent * self.users_per_client:
+                checked += 1
+                continue
+            waiter = queue.popleft()
+            if not queue:
+                self._rotation.remove(user)
+                self._waiters.pop(user, None)
+            self._running[user] = self._running.get(user, 0) + 1
+            self._client_running[client] = self._client_running.get(client, 0) + 1
+            self.in_flight += 1
+            waiter.set_result(None)
+            checked = 0
+
+    def _forget_waiter(self, user: str, waiter):
+        queue = self._waiters.get(user)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                self._waiters.pop(user, None)
+                if user in self._rotation:
+                    self._rotation.remove(user)
+
+    def _drop_admission(self, user: str):
+        self._decrement(self._client_admitted, self._client_of.get(user, user))
+        if not self._decrement(self._admitted, user) and user not in self._running:
+            self._client_of.pop(user, None)
+
+    def _decrement(self, counters: dict[str, int], key: str):
+        remaining = counters.get(key, 0) - 1
+        if remaining > 0:
+            counters[key] = remaining
+        else:
+            counters.pop(key, None)
+        return max(0, remaining)
+
+    def _bucket(self, buckets: dict[str, TokenBucket], key: str, scale: int):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(self.user_rate * scale, self.user_burst * scale)
+        return bucket
+
+    def _evict_idle_buckets(self):
+        """Drops buckets that have refilled completely, at most once per refill period."""
+        now = time.monotonic()
+        if now - self._last_eviction < self.user_burst / self.user_rate:
+            return
+        self._last_eviction = now
+        for buckets in (self._buckets, self._client_buckets):
+            for key in [k for k, bucket in buckets.items() if bucket.full]:
+                buckets.pop(key)
@@ -1,12 +1,82 @@
 import os
-import httpx
+import time
 import json
-from openai import AsyncOpenAI
+import asyncio
+from collections import deque
+# httpx and openai are imported on first use to keep API start-up fast
+
+class LLMEndpoint:
+    """Latency history and circuit-breaker state of one OpenAI-compatible endpoint."""
+
+    def __init__(self, base_url: str, model: str, failure_threshold: int = 3, cooldown: float = 60.0):
+        self.base_url = base_url
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latencies: deque = deque(maxlen=50)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    @property
+    def is_glm(self):
+        return self.model.startswith("glm-") or "bigmodel.cn" in self.base_url
+
+    def allow_request(self):
+        """Closed circuits always pass; an open one lets a single probe through once its cooldown ends."""
+        if not self.open_until:
+            return True
+        if time.monotonic() < self.open_until or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def p95(self, default: float):
+        if len(self.latencies) < 5:
+            return default
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.probing or self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown
+        self.probing = False
+
+    def release_probe(self):
+        """The probe ended without telling us anything (cancelled, client error); allow another one."""
+        self.probing = False
+
+def is_client_error(exc: BaseException):
+    """True for 4xx errors caused by the request (bad key, bad model) rather than the endpoint."""
+    # openai.APIStatusError carries status_code, httpx.HTTPStatusError carries response
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
 
 class AnalyzerService:
     def __init__(self):
         self.default_base_url = os.getenv("OPENAI_BASE_URL") or "https://api.deepseek.com/v1"
         self.default_model = os.getenv("OPENAI_MODEL") or "deepseek-chat"
+        self.hedge = os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes")
+        self.hedge_default_delay = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SEC") or 30)
+        self.failure_threshold = int(os.getenv("LLM_CIRCUIT_FAILURES") or 3)
+        self.cooldown = float(os.getenv("LLM_CIRCUIT_COOLDOWN_SEC") or 60)
+        self._endpoints: dict[tuple[str, str], LLMEndpoint] = {}
+        # Ordered fallbacks tried after the requested endpoint, e.g.
+        # LLM_ENDPOINTS='[{"base_url": "https://open.bigmodel.cn/api/paas/v4", "model": "glm-4-flash", "api_key": "..."}]'
+        self.fallbacks: list[dict] = []
+        try:
+            self.fallbacks = json.loads(os.getenv("LLM_ENDPOINTS") or "[]")
+        except ValueError as e:
+            print(f"Invalid LLM_ENDPOINTS: {e}")
 
     async def analyze_content(self, text: str, llm: dict | None = None, chapters: list[str] | None = None, word_count: int = 1000):
         llm = llm or {}
@@ -14,9 +84,6 @@ class AnalyzerService:
         model = (llm.get("model") or self.default_model).strip()
         api_key = (llm.get("api_key") or os.getenv("OPENAI_API_KEY") or "").strip()
 
-        # Check if using GLM models (support thinking parameter)
-        is_glm_model = model.startswith("glm-") or "bigmodel.cn" in base_url
-
         # Simple language detection (checking for Chinese characters)
         is_chinese = any('\u4e00' <= char <= '\u9fff' for char in text[:1000])
         language_instruction = "Respond in the same language as the content (Chinese if content is Chinese)."
@@ -57,8 +124,9 @@ class AnalyzerService:
             {text[:8000]}
             """
         
+        candidates = self._candidates(base_url, model, api_key)
         try:
-            if not api_key:
+            if not candidates:
                 return (
                     f"这是一个模拟摘要：当前未配置 API Key，因此未调用 AI。配置后会根据网页内容按章节生成约 {word_count} 字文章，并做适度扩展。" if is_chinese else f"This is a mock summary: API Key not configured. AI will generate a ~{word_count} word article based on web content after configuration.",
                     {"enabled": False, "base_url": base_url, "model": model}
@@ -67,32 +135,137 @@ class AnalyzerService:
             # Adjust max_tokens based on word count (approx 2 tokens per word for safety)
             max_tokens = max(2000, word_count * 2)
             
-            if is_glm_model:
-                # Use httpx directly to support GLM's thinking parameter
-                return await self._call_glm_with_thinking(base_url, api_key, model, prompt, is_chinese, max_tokens)
-            else:
-                # Use standard OpenAI SDK
-                client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-                system_msg = "你是一个专门负责网页内容摘要的助手。" if is_chinese else "You are a helpful assistant that summarizes web content."
-                
-                response = await client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": system_msg},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=max_tokens
-                )
-                return response.choices[0].message.content, {"enabled": True, "base_url": base_url, "model": model}
+            return await self._call_with_failover(candidates, prompt, is_chinese, max_tokens)
         except Exception as e:
             print(f"AI Analysis failed: {e}")
             return (
                 f"AI Analysis failed. Original text preview: {text[:500]}...",
-                {"enabled": False, "base_url": base_url, "model": model, "error": str(e)}
+                {"enabled": False, "base_url": base_url, "model": model, "error": str(e), "attempts": getattr(e, "attempts", [])}
             )
+
+    async def warm_up(self):
+        """Imports the LLM client libraries ahead of the first request."""
+        await asyncio.to_thread(self._import_clients)
+
+    def _import_clients(self):
+        import httpx  # noqa: F401
+        import openai  # noqa: F401
+
+    def _endpoint(self, base_url: str, model: str):
+        key = (base_url, model)
+        if key not in self._endpoints:
+            self._endpoints[key] = LLMEndpoint(base_url, model, self.failure_threshold, self.cooldown)
+        return self._endpoints[key]
+
+    def _candidates(self, base_url: str, model: str, api_key: str):
+        """Requested endpoint first, then configured fallbacks that carry their own key."""
+        candidates = []
+        seen = set()
+        if api_key:
+            candidates.append((self._endpoint(base_url, model), api_key))
+            seen.add((base_url, model))
+        for config in self.fallbacks:
+            ep_base_url = (config.get("base_url") or self.default_base_url).strip()
+            ep_model = (config.get("model") or self.default_model).strip()
+            # Never send OPENAI_API_KEY to another provider's base_url
+            ep_key = (config.get("api_key") or "").strip()
+            if not ep_key or (ep_base_url, ep_model) in seen:
+                continue
+            seen.add((ep_base_url, ep_model))
+            candidates.append((self._endpoint(ep_base_url, ep_model), ep_key))
+        return candidates
+
+    async def _call_with_failover(self, candidates: list, prompt: str, is_chinese: bool, max_tokens: int):
+        queue = list(candidates)
+        # call -> (endpoint, start time, whether it is the single probe of an open circuit)
+        pending: dict[asyncio.Task, tuple[LLMEndpoint, float, bool]] = {}
+        attempts = []
+        hedged = False
+
+        def launch():
+            """Starts the next endpoint whose circuit lets a request through; False if none is left."""
+            while queue:
+                endpoint, api_key = queue.pop(0)
+                probe = bool(endpoint.open_until)
+                if not endpoint.allow_request():
+                    attempts.append({"base_url": endpoint.base_url, "model": endpoint.model, "error": "circuit open"})
+                    continue
+                call = asyncio.create_task(self._call_endpoint(endpoint, api_key, prompt, is_chinese, max_tokens))
+                pending[call] = (endpoint, time.monotonic(), probe)
+                return True
+            return False
+
+        launch()
+        try:
+            while pending:
+                # Hedge: if the only request in flight is slower than its p95, race the next endpoint
+                timeout = None
+                if self.hedge and queue and len(pending) == 1:
+                    endpoint, started, _ = next(iter(pending.values()))
+                    timeout = max(0.0, endpoint.p95(self.hedge_default_delay) - (time.monotonic() - started))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = launch() or hedged
+                    continue
+                for call in done:
+                    endpoint, started, probe = pending.pop(call)
+                    latency = time.monotonic() - started
+                    if call.exception() is None:
+                        endpoint.record_success(latency)
+                        meta = {
+                            "enabled": True,
+                            "base_url": endpoint.base_url,
+                            "model": endpoint.model,
+                            "latency_ms": int(latency * 1000),
+                            "hedged": hedged,
+                            "attempts": attempts
+                        }
+                        if endpoint.is_glm:
+                            meta["thinking"] = "enabled"
+                        return call.result(), meta
+                    # A caller's bad key must not open the circuit for everyone sharing the endpoint
+                    if is_client_error(call.exception()):
+                        if probe:
+                            endpoint.release_probe()
+                    else:
+                        endpoint.record_failure()
+                    attempts.append({"base_url": endpoint.base_url, "model": endpoint.model, "error": str(call.exception())})
+                    print(f"LLM endpoint {endpoint.base_url} ({endpoint.model}) failed: {call.exception()}")
+                if queue and not pending:
+                    launch()
+        finally:
+            # Cancel the slower hedge (or everything, if we were cancelled ourselves)
+            for call, (endpoint, _, probe) in pending.items():
+                call.cancel()
+                if probe:
+                    endpoint.release_probe()
+        error = RuntimeError("All LLM endpoints failed: " + "; ".join(a["error"] for a in attempts))
+        error.attempts = attempts
+        raise error
+
+    async def _call_endpoint(self, endpoint: LLMEndpoint, api_key: str, prompt: str, is_chinese: bool, max_tokens: int):
+        if endpoint.is_glm:
+            # Use httpx directly to support GLM's thinking parameter
+            return await self._call_glm_with_thinking(endpoint.base_url, api_key, endpoint.model, prompt, is_chinese, max_tokens)
+
+        # Use standard OpenAI SDK
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=api_key, base_url=endpoint.base_url)
+        system_msg = "你是一个专门负责网页内容摘要的助手。" if is_chinese else "You are a helpful assistant that summarizes web content."
+        
+        response = await client.chat.completions.create(
+            model=endpoint.model,
+            messages=[
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
     
     async def _call_glm_with_thinking(self, base_url: str, api_key: str, model: str, prompt: str, is_chinese: bool, max_tokens: int):
         """Call GLM API with thinking parameter using httpx"""
+        import httpx
         async with httpx.AsyncClient(timeout=60.0) as client:
             url = f"{base_url.rstrip('/')}/chat/completions"
             headers = {
@@ -119,5 +292,4 @@ class AnalyzerService:
             response.raise_for_status()
             
             result = response.json()
-            content = result["choices"][0]["message"]["content"]
-            return content, {"enabled": True, "base_url": base_url, "model": model, "thinking": "enabled"}
+            return result["choices"][0]["message"]["content"]
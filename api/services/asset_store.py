@@ -0,0 +1,257 @@
+import os
+import json
+import hashlib
+import threading
+
+class AssetStoreService:
+    """Content-addressed blob store for scraped images and screenshots.
+
+    Blobs live under ``storage/blobs/{sha[:2]}/{sha}{ext}`` and are shared by
+    every task that references them; next to each blob a ``{sha}.json`` record
+    keeps its reference count and the source URLs that produced it. Each task
+    gets a manifest in ``storage/manifests/{task_id[:2]}/{task_id}.json``
+    mapping its asset names to blobs, and ``storage/urls/{h[:2]}/{h}.json``
+    keeps the last known ETag/Last-Modified of every source URL so repeated
+    downloads can be skipped.
+    Every change rewrites only the small records it touches.
+    """
+
+    def __init__(self, storage_dir="storage"):
+        self.storage_dir = storage_dir
+        self.blobs_dir = os.path.join(storage_dir, "blobs")
+        self.manifests_dir = os.path.join(storage_dir, "manifests")
+        self.urls_dir = os.path.join(storage_dir, "urls")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        os.makedirs(self.urls_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        # Blobs whose reference count dropped to zero; None until the first GC has scanned every record
+        self._dead: set[str] | None = None
+        self._migrate_index()
+        self._migrate_manifests()
+
+    def blob_path(self, sha: str, ext: str = ""):
+        return os.path.join(self.blobs_dir, sha[:2], f"{sha}{ext}")
+
+    def lookup_url(self, url: str):
+        """Returns the cached validator record for a source URL if its blob still exists."""
+        with self._lock:
+            record = self._load_json(self._url_path(url), None)
+            if not record:
+                return None
+            blob = self._load_blob(record.get("sha256"))
+            if not blob or not os.path.exists(self.blob_path(record["sha256"], blob.get("ext", ""))):
+                return None
+            return record
+
+    def put_bytes(self, task_id: str, asset_type: str, name: str, data: bytes, url: str | None = None, etag: str | None = None, last_modified: str | None = None, content_type: str | None = None):
+        sha = hashlib.sha256(data).hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+        with self._lock:
+            blobs = {sha: self._load_blob(sha)}
+            if blobs[sha]:
+                ext = blobs[sha].get("ext", ext)
+            path = self.blob_path(sha, ext)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            if not blobs[sha]:
+                blobs[sha] = {"ext": ext, "size": len(data), "refs": 0, "urls": []}
+            if url:
+                if url not in blobs[sha].setdefault("urls", []):
+                    blobs[sha]["urls"].append(url)
+                self._write_json(self._url_path(url), {"sha256": sha, "etag": etag, "last_modified": last_modified, "content_type": content_type})
+            # Link before releasing the lock so collect_garbage never sees the new blob at refs 0
+            manifest = self.get_manifest(task_id)
+            path = self._link(manifest, blobs, asset_type, name, sha, url, content_type)
+            self._write_json(self._manifest_path(task_id), manifest)
+            self._save_blobs(blobs)
+            return path
+
+    def link(self, task_id: str, asset_type: str, name: str, sha: str, url: str | None = None, content_type: str | None = None):
+        """Adds a reference from a task manifest to an existing blob and returns its path."""
+        with self._lock:
+            manifest = self.get_manifest(task_id)
+            blobs = {}
+            path = self._link(manifest, blobs, asset_type, name, sha, url, content_type)
+            self._write_json(self._manifest_path(task_id), manifest)
+            self._save_blobs(blobs)
+            return path
+
+    def copy_task(self, src_task_id: str, dst_task_id: str):
+        """Gives another task references to all of a task's blobs without copying any bytes."""
+        with self._lock:
+            manifest = self.get_manifest(dst_task_id)
+            blobs = {}
+            for entry in self.get_manifest(src_task_id):
+                self._link(manifest, blobs, entry["type"], entry["name"], entry["sha256"], entry.get("url"), entry.get("content_type"))
+            self._write_json(self._manifest_path(dst_task_id), manifest)
+            self._save_blobs(blobs)
+            return manifest
+
+    def get_manifest(self, task_id: str):
+        return self._load_json(self._manifest_path(task_id), [])
+
+    def has_manifest(self, task_id: str):
+        return os.path.exists(self._manifest_path(task_id))
+
+    def resolve(self, task_id: str, asset_type: str, name: str):
+        for entry in self.get_manifest(task_id):
+            if entry["type"] == asset_type and entry["name"] == name:
+                return entry["path"]
+        return None
+
+    def referenced_bytes(self, task_id: str):
+        """Size of every blob a task references, counting shared blobs in full."""
+        sizes = {}
+        for entry in self.get_manifest(task_id):
+            if entry["sha256"] not in sizes:
+                sizes[entry["sha256"]] = (self._load_blob(entry["sha256"]) or {}).get("size", 0)
+        return sum(sizes.values())
+
+    def release_task(self, task_id: str):
+        """Drops every reference held by a task; blobs are removed by collect_garbage."""
+        with self._lock:
+            manifest = self.get_manifest(task_id)
+            blobs = {}
+            for entry in manifest:
+                self._decref(blobs, entry["sha256"])
+            self._save_blobs(blobs)
+            manifest_path = self._manifest_path(task_id)
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+        return len(manifest)
+
+    def collect_garbage(self):
+        """Deletes blobs with no remaining references and returns the number of bytes freed."""
+        freed = 0
+        with self._lock:
+            if self._dead is None:
+                self._dead = set(self._scan_unreferenced())
+            for sha in list(self._dead):
+                self._dead.discard(sha)
+                blob = self._load_blob(sha)
+                if blob and blob.get("refs", 0) > 0:
+                    continue
+                for url in (blob or {}).get("urls", []):
+                    url_path = self._url_path(url)
+                    if (self._load_json(url_path, None) or {}).get("sha256") == sha:
+                        os.remove(url_path)
+                shard = os.path.dirname(self.blob_path(sha))
+                # Remove the blob together with its record and any derivatives cached next to it
+                for name in os.listdir(shard) if os.path.isdir(shard) else []:
+                    if name.startswith(sha):
+                        path = os.path.join(shard, name)
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+        return freed
+
+    def _link(self, manifest: list, blobs: dict, asset_type: str, name: str, sha: str, url: str | None, content_type: str | None):
+        """Adds one reference to an in-memory manifest; callers hold the lock and persist both."""
+        blob = self._blob(blobs, sha)
+        if not blob:
+            raise KeyError(f"Unknown blob {sha}")
+        path = self.blob_path(sha, blob.get("ext", ""))
+        previous = next((e for e in manifest if e["type"] == asset_type and e["name"] == name), None)
+        if previous:
+            if previous["sha256"] == sha:
+                return path
+            manifest.remove(previous)
+            self._decref(blobs, previous["sha256"])
+        manifest.append({
+            "type": asset_type,
+            "name": name,
+            "sha256": sha,
+            "path": path,
+            "url": url,
+            "content_type": content_type
+        })
+        blob["refs"] = blob.get("refs", 0) + 1
+        return path
+
+    def _blob(self, blobs: dict, sha: str):
+        if sha not in blobs:
+            blobs[sha] = self._load_blob(sha)
+        return blobs[sha]
+
+    def _decref(self, blobs: dict, sha: str):
+        blob = self._blob(blobs, sha)
+        if blob:
+            blob["refs"] = max(0, blob.get("refs", 0) - 1)
+
+    def _save_blobs(self, blobs: dict):
+        for sha, blob in blobs.items():
+            if blob is None:
+                continue
+            self._write_json(self._record_path(sha), blob)
+            if self._dead is not None:
+                if blob.get("refs", 0) <= 0:
+                    self._dead.add(sha)
+                else:
+                    self._dead.discard(sha)
+
+    def _load_blob(self, sha: str | None):
+        if not sha:
+            return None
+        return self._load_json(self._record_path(sha), None)
+
+    def _scan_unreferenced(self):
+        for dirpath, _, filenames in os.walk(self.blobs_dir):
+            for name in filenames:
+                sha, ext = os.path.splitext(name)
+                if ext != ".json" or "." in sha:
+                    continue
+                blob = self._load_json(os.path.join(dirpath, name), None)
+                if blob is not None and blob.get("refs", 0) <= 0:
+                    yield sha
+
+    def _migrate_index(self):
+        """Splits the single index.json of earlier versions into per-blob and per-URL records."""
+        legacy_path = os.path.join(self.blobs_dir, "index.json")
+        if not os.path.exists(legacy_path):
+            return
+        index = self._load_json(legacy_path, {})
+        urls_by_sha: dict[str, list[str]] = {}
+        for url, record in (index.get("urls") or {}).items():
+            self._write_json(self._url_path(url), record)
+            urls_by_sha.setdefault(record.get("sha256"), []).append(url)
+        for sha, blob in (index.get("blobs") or {}).items():
+            self._write_json(self._record_path(sha), {**blob, "urls": urls_by_sha.get(sha, [])})
+        os.remove(legacy_path)
+
+    def _migrate_manifests(self):
+        """Moves manifests from the flat layout of earlier versions into their shard directories."""
+        for name in os.listdir(self.manifests_dir):
+            path = os.path.join(self.manifests_dir, name)
+            if name.endswith(".json") and os.path.isfile(path):
+                target = self._manifest_path(name[:-len(".json")])
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+
+    def _record_path(self, sha: str):
+        return self.blob_path(sha, ".json")
+
+    def _url_path(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.urls_dir, key[:2], f"{key}.json")
+
+    def _manifest_path(self, task_id: str):
+        task_id = os.path.basename(task_id)
+        return os.path.join(self.manifests_dir, task_id[:2], f"{task_id}.json")
+
+    def _load_json(self, path: str, default):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _write_json(self, path: str, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,83 @@
+import os
+import json
+import hashlib
+import threading
+
+class PageCacheService:
+    """Per-URL validators, scraped snapshots and finished outputs from earlier runs.
+
+    One record per URL lives in ``storage/pages/{sha[:2]}/{sha}.json``. The
+    snapshot lets an unchanged page skip the browser entirely, and outputs
+    (keyed by a fingerprint of the generation settings) let the pipeline
+    reuse the article, narration and video of the last identical run.
+    """
+
+    def __init__(self, storage_dir="storage"):
+        self.storage_dir = storage_dir
+        self.pages_dir = os.path.join(storage_dir, "pages")
+        os.makedirs(self.pages_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def get(self, url: str):
+        with self._lock:
+            return self._load(url)
+
+    def record_snapshot(self, url: str, validators: dict, task_id: str, title: str, content: str, asset_count: int):
+        with self._lock:
+            record = self._load(url) or {"url": url, "outputs": {}}
+            # Outputs were built from the previous version of the page; a new version invalidates them
+            if any(record.get(k) != validators.get(k) for k in ("etag", "last_modified", "content_hash")):
+                record["outputs"] = {}
+            record.update(validators)
+            record["snapshot"] = {"task_id": task_id, "title": title, "content": content, "asset_count": asset_count}
+            self._save(url, record)
+
+    def record_outputs(self, url: str, fingerprint: str, task_id: str, result: dict, meta: dict):
+        with self._lock:
+            record = self._load(url)
+            if record is None:
+                return
+            record.setdefault("outputs", {})[fingerprint] = {
+                "task_id": task_id,
+                "result": {k: result.get(k) for k in ("article_path", "audio_path", "video_path")},
+                "meta": {k: meta.get(k) for k in ("llm", "tts")}
+            }
+            self._save(url, record)
+
+    def find_outputs(self, url: str, fingerprint: str):
+        """Returns the outputs of an earlier identical run if its article and video still exist."""
+        record = self.get(url)
+        outputs = ((record or {}).get("outputs") or {}).get(fingerprint)
+        if not outputs:
+            return None
+        for key in ("article_path", "video_path"):
+            path = outputs["result"].get(key)
+            if not path or not os.path.exists(path):
+                return None
+        return outputs
+
+    def fingerprint(self, params: dict):
+        llm = dict(params.get("llm") or {})
+        llm.pop("api_key", None)
+        settings = {k: params.get(k) for k in ("chapters", "word_count", "voice", "render")}
+        settings["llm"] = llm
+        return hashlib.sha256(json.dumps(settings, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _path(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.pages_dir, key[:2], f"{key}.json")
+
+    def _load(self, url: str):
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, url: str, record: dict):
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+from .asset_store import AssetStoreService
+
+def shard_dir(base_dir: str, key: str):
+    """Spreads per-task files over 256 subdirectories so no directory grows unbounded."""
+    return os.path.join(base_dir, key[:2])
+
+class RetentionService:
+    """Age limits, a total quota and LRU eviction for everything under storage/."""
+
+    # artifact class -> directories under storage_dir holding that class
+    ARTIFACT_CLASSES = {
+        "videos": ["videos"],
+        "articles": ["articles"],
+        "audio": ["audio"],
+        "temp": ["temp"],
+        "assets": ["manifests", "images", "screenshots"],
+    }
+
+    def __init__(self, storage_dir="storage", asset_store: AssetStoreService | None = None):
+        self.storage_dir = storage_dir
+        self.asset_store = asset_store or AssetStoreService(storage_dir)
+        self.access_path = os.path.join(storage_dir, "access.json")
+        self.quota_bytes = int(float(os.getenv("STORAGE_QUOTA_MB") or 0) * 1024 * 1024)
+        self.sweep_interval = float(os.getenv("STORAGE_SWEEP_INTERVAL_SEC") or 600)
+        self.max_age = {}
+        for name in self.ARTIFACT_CLASSES:
+            hours = os.getenv(f"STORAGE_MAX_AGE_{name.upper()}_HOURS")
+            if hours:
+                self.max_age[name] = float(hours) * 3600
+        self.max_age.setdefault("temp", 24 * 3600)
+        self.max_age.setdefault("audio", 7 * 24 * 3600)
+        self._lock = threading.Lock()
+        self._access = self._load_access()
+
+    def touch(self, task_id: str):
+        """Records a read of a task's artifacts for LRU eviction."""
+        with self._lock:
+            self._access[task_id] = time.time()
+
+    def sweep(self, active: set[str] | None = None):
+        """Applies age limits and the quota; tasks in `active` are never touched."""
+        active = active or set()
+        now = time.time()
+        units = self._scan()
+        freed = 0
+
+        for key, files in list(units.items()):
+            if key in active:
+                continue
+            last_used = self._last_used(key, files)
+            expired = [f for f in files if f["class"] in self.max_age and now - last_used > self.max_age[f["class"]]]
+            if expired:
+                freed += self._remove(key, expired)
+                remaining = [f for f in files if f not in expired]
+                if remaining:
+                    units[key] = remaining
+                else:
+                    units.pop(key)
+                    self._forget(key)
+        freed += self.asset_store.collect_garbage()
+
+        if self.quota_bytes:
+            usage = self._usage()
+            candidates = sorted((k for k in units if k not in active), key=lambda k: self._last_used(k, units[k]))
+            evicted = False
+            for key in candidates:
+                if usage <= self.quota_bytes:
+                    break
+                # Blobs shared with surviving tasks are not freed, so this may undershoot; the next sweep catches up
+                blob_bytes = self.asset_store.referenced_bytes(key)
+                removed = self._remove(key, units[key])
+                usage -= removed + blob_bytes
+                freed += removed
+                self._forget(key)
+                evicted = True
+            # One collection for all evicted tasks keeps the store lock short
+            if evicted:
+                freed += self.asset_store.collect_garbage()
+
+        self._save_access()
+        return freed
+
+    def _scan(self):
+        units: dict[str, list[dict]] = {}
+        for cls, dirs in self.ARTIFACT_CLASSES.items():
+            for d in dirs:
+                root = os.path.join(self.storage_dir, d)
+                if not os.path.isdir(root):
+                    continue
+                legacy_asset_dir = d in ("images", "screenshots")
+                for dirpath, _, filenames in os.walk(root):
+                    for name in filenames:
+                        if name.endswith(".tmp"):
+                            continue
+                        path = os.path.join(dirpath, name)
+                        if legacy_asset_dir:
+                            key = os.path.basename(dirpath)
+                        else:
+                            key = name.split(".", 1)[0]
+                        try:
+                            st = os.stat(path)
+                        except OSError:
+                            continue
+                        units.setdefault(key, []).append({"class": cls, "path": path, "size": st.st_size, "mtime": st.st_mtime})
+        return units
+
+    def _usage(self):
+        total = 0
+        for d in ["videos", "articles", "audio", "temp", "blobs", "images", "screenshots"]:
+            for dirpath, _, filenames in os.walk(os.path.join(self.storage_dir, d)):
+                for name in filenames:
+                    try:
+                        total += os.path.getsize(os.path.join(dirpath, name))
+                    except OSError:
+                        continue
+        return total
+
+    def _last_used(self, key: str, files: list[dict]):
+        with self._lock:
+            accessed = self._access.get(key, 0)
+        return max([accessed] + [f["mtime"] for f in files])
+
+    def _remove(self, key: str, files: list[dict]):
+        freed = 0
+        for f in files:
+            if f["path"].startswith(os.path.join(self.storage_dir, "manifests")):
+                self.asset_store.release_task(key)
+                continue
+            try:
+                os.remove(f["path"])
+                freed += f["size"]
+            except OSError:
+                continue
+            parent = os.path.dirname(f["path"])
+            if os.path.basename(parent) == key and not os.listdir(parent):
+                os.rmdir(parent)
+        return freed
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._access.pop(key, None)
+
+    def _load_access(self):
+        try:
+            with open(self.access_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_access(self):
+        with self._lock:
+            data = dict(self._access)
+        tmp_path = f"{self.access_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.access_path)
@@ -1,20 +1,34 @@
-import os
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
 import uuid
 import asyncio
 from urllib.parse import urljoin, urlparse
-import requests
+import hashlib
+# playwright, bs4 and requests are imported where they are used to keep API start-up fast
+from .asset_store import AssetStoreService
+from .page_cache import PageCacheService
+
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 AutoRead/1.0",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
+}
 
 class ScraperService:
-    def __init__(self, storage_dir="storage"):
+    def __init__(self, storage_dir="storage", asset_store: AssetStoreService | None = None, page_cache: PageCacheService | None = None):
         self.storage_dir = storage_dir
-        self.screenshots_dir = os.path.join(storage_dir, "screenshots")
-        self.images_dir = os.path.join(storage_dir, "images")
-        os.makedirs(self.screenshots_dir, exist_ok=True)
-        os.makedirs(self.images_dir, exist_ok=True)
+        self.asset_store = asset_store or AssetStoreService(storage_dir)
+        self.page_cache = page_cache or PageCacheService(storage_dir)
+
+    async def warm_up(self):
+        """Imports the browser stack and launches Chromium once so the first task starts warm."""
+        from playwright.async_api import async_playwright
+        import bs4  # noqa: F401
+        import requests  # noqa: F401
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            await browser.close()
 
     async def get_chapters(self, url: str):
+        from playwright.async_api import async_playwright
+        from bs4 import BeautifulSoup
         try:
             async with async_playwright() as p:
                 browser = await p.chromium.launch(headless=True)
@@ -71,6 +85,61 @@ class ScraperService:
             return {"title": url, "chapters": []}
 
     async def scrape_url(self, url: str, task_id: str):
+        """Scrapes a page, reusing the previous snapshot when the server says it is unchanged."""
+        cached = self.page_cache.get(url)
+        # Only a page with validators from an earlier scrape is worth an extra request up front
+        if self._snapshot_usable(cached) and self._conditional_headers(cached):
+            try:
+                if await asyncio.to_thread(self._revalidate, url, cached):
+                    return await asyncio.to_thread(self._reuse_snapshot, cached, task_id)
+            except Exception as e:
+                print(f"Revalidation of {url} failed: {e}")
+
+        result = await self._scrape_fresh(url, task_id)
+        validators = result.pop("validators", None)
+        if validators and (validators.get("etag") or validators.get("last_modified")):
+            self.page_cache.record_snapshot(url, validators, task_id, result["title"], result["content"], len(result["images"]) + len(result["screenshots"]))
+        return result
+
+    def _revalidate(self, url: str, cached: dict):
+        """Conditional GET of the page; True when the server reports it unchanged."""
+        import requests
+        resp = requests.get(url, headers={**REQUEST_HEADERS, **self._conditional_headers(cached)}, timeout=30)
+        if resp.status_code == 304:
+            return True
+        resp.raise_for_status()
+        # Some servers ignore the conditional headers; fall back to comparing the body
+        return cached.get("content_hash") == hashlib.sha256(resp.content).hexdigest()
+
+    def _validators(self, headers, body: bytes | None):
+        """Validators of the page version that was just scraped, taken from the page response itself."""
+        return {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_hash": hashlib.sha256(body).hexdigest() if body is not None else None
+        }
+
+    def _snapshot_usable(self, cached: dict | None):
+        snapshot = (cached or {}).get("snapshot")
+        if not snapshot:
+            return False
+        return not snapshot.get("asset_count") or self.asset_store.has_manifest(snapshot["task_id"])
+
+    def _reuse_snapshot(self, cached: dict, task_id: str):
+        snapshot = cached["snapshot"]
+        manifest = self.asset_store.copy_task(snapshot["task_id"], task_id)
+        return {
+            "title": snapshot["title"],
+            "content": snapshot["content"],
+            "screenshots": [e["path"] for e in manifest if e["type"] == "screenshots"],
+            "images": [e["path"] for e in manifest if e["type"] == "images"],
+            "unchanged": True,
+            "previous_task_id": snapshot["task_id"]
+        }
+
+    async def _scrape_fresh(self, url: str, task_id: str):
+        from playwright.async_api import async_playwright
+        from bs4 import BeautifulSoup
         try:
             async with async_playwright() as p:
                 browser = await p.chromium.launch(headless=True)
@@ -83,7 +152,13 @@ class ScraperService:
                 page = await context.new_page()
                 
                 try:
-                    await page.goto(url, wait_until="networkidle", timeout=60000)
+                    response = await page.goto(url, wait_until="networkidle", timeout=60000)
+                    validators = None
+                    if response is not None:
+                        try:
+                            validators = self._validators(response.headers, await response.body())
+                        except Exception:
+                            validators = self._validators(response.headers, None)
                     
                     # Try to find and click Chinese language toggle if page seems to be in English
                     await self._try_switch_to_chinese(page)
@@ -91,24 +166,18 @@ class ScraperService:
                     title = await page.title()
                     
                     screenshot_paths = []
-                    task_screenshot_dir = os.path.join(self.screenshots_dir, task_id)
-                    os.makedirs(task_screenshot_dir, exist_ok=True)
                     
-                    path1 = os.path.join(task_screenshot_dir, "screenshot_1.png")
-                    await page.screenshot(path=path1)
-                    screenshot_paths.append(path1)
+                    shot1 = await page.screenshot(type="jpeg", quality=85)
+                    screenshot_paths.append(await asyncio.to_thread(self.asset_store.put_bytes, task_id, "screenshots", "screenshot_1.jpg", shot1, content_type="image/jpeg"))
                     
                     # Scroll multiple times to trigger lazy loading
                     for _ in range(3):
                         await page.evaluate("window.scrollBy(0, window.innerHeight)")
                         await asyncio.sleep(0.5)
                     
-                    path2 = os.path.join(task_screenshot_dir, "screenshot_2.png")
-                    await page.screenshot(path=path2)
-                    screenshot_paths.append(path2)
+                    shot2 = await page.screenshot(type="jpeg", quality=85)
+                    screenshot_paths.append(await asyncio.to_thread(self.asset_store.put_bytes, task_id, "screenshots", "screenshot_2.jpg", shot2, content_type="image/jpeg"))
     
-                    task_images_dir = os.path.join(self.images_dir, task_id)
-                    os.makedirs(task_images_dir, exist_ok=True)
                     image_paths: list[str] = []
     
                     image_candidates = await page.evaluate(
@@ -149,18 +218,18 @@ class ScraperService:
                             resolved = urljoin(page.url, raw_src)
                             if resolved.startswith("data:"):
                                 continue
-                            response = await context.request.get(resolved, timeout=20000)
+                            cached = await asyncio.to_thread(self.asset_store.lookup_url, resolved)
+                            response = await context.request.get(resolved, headers=self._conditional_headers(cached), timeout=20000)
+                            if response.status == 304 and cached:
+                                image_paths.append(await asyncio.to_thread(self._link_cached_image, task_id, idx, resolved, cached))
+                                continue
                             if not response.ok:
                                 continue
                             content_type = response.headers.get("content-type")
                             if content_type and not content_type.lower().startswith("image/"):
                                 continue
-                            ext = self._infer_extension(resolved, content_type)
-                            img_path = os.path.join(task_images_dir, f"image_{idx + 1}{ext}")
                             body = await response.body()
-                            with open(img_path, "wb") as f:
-                                f.write(body)
-                            image_paths.append(img_path)
+                            image_paths.append(await asyncio.to_thread(self._store_image, task_id, idx, resolved, content_type, response.headers, body))
                         except Exception:
                             continue
      
@@ -174,7 +243,8 @@ class ScraperService:
                         "title": title,
                         "content": text[:10000],
                         "screenshots": screenshot_paths,
-                        "images": image_paths
+                        "images": image_paths,
+                        "validators": validators
                     }
                     
                 finally:
@@ -227,11 +297,27 @@ class ScraperService:
                 return ".jpg" if ext == ".jpeg" else ext
         return ".jpg"
 
+    def _conditional_headers(self, cached: dict | None):
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def _link_cached_image(self, task_id: str, idx: int, url: str, cached: dict):
+        """Reuses the blob of an unchanged image instead of downloading it again."""
+        ext = self._infer_extension(url, cached.get("content_type"))
+        return self.asset_store.link(task_id, "images", f"image_{idx + 1}{ext}", cached["sha256"], url=url, content_type=cached.get("content_type"))
+
+    def _store_image(self, task_id: str, idx: int, url: str, content_type: str | None, headers, body: bytes):
+        ext = self._infer_extension(url, content_type)
+        return self.asset_store.put_bytes(task_id, "images", f"image_{idx + 1}{ext}", body, url=url, etag=headers.get("etag"), last_modified=headers.get("last-modified"), content_type=content_type)
+
     def _scrape_via_requests(self, url: str, task_id: str):
-        headers = {
-            "User-Agent": "Mozilla/5.0 AutoRead/1.0",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
-        }
+        import requests
+        from bs4 import BeautifulSoup
+        headers = REQUEST_HEADERS
         resp = requests.get(url, headers=headers, timeout=30)
         resp.raise_for_status()
         html = resp.text
@@ -243,8 +329,6 @@ class ScraperService:
 
         text = soup.get_text(separator=" ", strip=True)
 
-        task_images_dir = os.path.join(self.images_dir, task_id)
-        os.makedirs(task_images_dir, exist_ok=True)
         image_paths: list[str] = []
         img_tags = soup.select("article img, main img, img")
         seen: set[str] = set()
@@ -261,17 +345,17 @@ class ScraperService:
                 continue
             seen.add(resolved)
             try:
-                r = requests.get(resolved, headers=headers, timeout=20)
+                cached = self.asset_store.lookup_url(resolved)
+                r = requests.get(resolved, headers={**headers, **self._conditional_headers(cached)}, timeout=20)
+                if r.status_code == 304 and cached:
+                    image_paths.append(self._link_cached_image(task_id, idx, resolved, cached))
+                    continue
                 if r.status_code != 200:
                     continue
                 content_type = r.headers.get("content-type")
                 if content_type and not content_type.lower().startswith("image/"):
                     continue
-                ext = self._infer_extension(resolved, content_type)
-                img_path = os.path.join(task_images_dir, f"image_{idx + 1}{ext}")
-                with open(img_path, "wb") as f:
-                    f.write(r.content)
-                image_paths.append(img_path)
+                image_paths.append(self._store_image(task_id, idx, resolved, content_type, r.headers, r.content))
             except Exception:
                 continue
 
@@ -279,5 +363,6 @@ class ScraperService:
             "title": title,
             "content": text[:10000],
             "screenshots": [],
-            "images": image_paths
+            "images": image_paths,
+            "validators": self._validators(resp.headers, resp.content)
         }
@@ -0,0 +1,70 @@
+import os
+import functools
+import tempfile
+
+@functools.cache
+def _pillow():
+    """Imports Pillow on first use; returns None when it is not installed."""
+    try:
+        from PIL import Image, features
+        return Image, features
+    except Exception:
+        return None
+
+class ThumbnailService:
+    """Downscaled WebP/JPEG derivatives cached next to the original asset."""
+
+    # size name -> longest edge in pixels
+    SIZES = {"thumb": 320, "preview": 1280}
+
+    def __init__(self, quality: int = 80):
+        self.quality = quality
+
+    @functools.cached_property
+    def format(self):
+        pillow = _pillow()
+        return "WEBP" if pillow is not None and pillow[1].check("webp") else "JPEG"
+
+    @property
+    def ext(self):
+        return ".webp" if self.format == "WEBP" else ".jpg"
+
+    def derivative_path(self, path: str, size: str):
+        return f"{os.path.splitext(path)[0]}.{size}{self.ext}"
+
+    def get(self, path: str, size: str):
+        """Returns the cached derivative, creating it on first use; falls back to the original."""
+        if size not in self.SIZES or _pillow() is None:
+            return path
+        out_path = self.derivative_path(path, size)
+        if os.path.exists(out_path):
+            return out_path
+        try:
+            self._render(path, out_path, self.SIZES[size])
+            return out_path
+        except Exception as e:
+            print(f"Thumbnail generation failed for {path}: {e}")
+            return path
+
+    def generate_all(self, paths: list[str]):
+        for path in paths or []:
+            for size in self.SIZES:
+                self.get(path, size)
+
+    def _render(self, path: str, out_path: str, max_edge: int):
+        Image = _pillow()[0]
+        with Image.open(path) as img:
+            img.thumbnail((max_edge, max_edge))
+            if img.mode not in ("RGB", "RGBA") or (self.format == "JPEG" and img.mode == "RGBA"):
+                img = img.convert("RGB")
+            # Scrape-time generation and on-demand requests can render the same
+            # derivative concurrently, so each writer gets its own temp file
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(out_path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, self.format, quality=self.quality)
+                os.replace(tmp_path, out_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
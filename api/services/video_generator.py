@@ -1,70 +1,170 @@
 import os
-import edge_tts
-from moviepy import ImageClip, AudioFileClip
 import asyncio
 import wave
+import shutil
+import hashlib
+import functools
+import multiprocessing
+from types import SimpleNamespace
+from collections import OrderedDict
+from .retention import shard_dir
+# edge_tts and moviepy are imported on first use to keep API start-up fast;
+# moviepy (with numpy and imageio) is only ever needed inside the render worker.
 
-try:
-    from moviepy import concatenate_videoclips
-except Exception:
-    concatenate_videoclips = None
+@functools.cache
+def _moviepy():
+    from moviepy import ImageClip, AudioFileClip
+    api = SimpleNamespace(ImageClip=ImageClip, AudioFileClip=AudioFileClip, concatenate_videoclips=None, ConcatenateVideoClip=None, ColorClip=None)
 
-try:
-    from moviepy import ConcatenateVideoClip
-except Exception:
-    ConcatenateVideoClip = None
+    try:
+        from moviepy import concatenate_videoclips
+        api.concatenate_videoclips = concatenate_videoclips
+    except Exception:
+        pass
 
-try:
-    from moviepy import ColorClip
-except Exception:
-    ColorClip = None
+    try:
+        from moviepy import ConcatenateVideoClip
+        api.ConcatenateVideoClip = ConcatenateVideoClip
+    except Exception:
+        pass
+
+    try:
+        from moviepy import ColorClip
+        api.ColorClip = ColorClip
+    except Exception:
+        pass
+
+    return api
+
+# Put the moov atom first so players can start and seek before the download finishes
+FASTSTART_PARAMS = ["-movflags", "+faststart"]
+
+DEFAULT_PREVIEW_TEXT = "你好，这是 Auto Read 的试听片段。祝您使用愉快！"
+
+DEFAULT_RENDER = {"width": 1920, "height": 1080, "fps": 24, "preset": "medium"}
 
 class VideoGeneratorService:
     def __init__(self, storage_dir="storage"):
         self.storage_dir = storage_dir
         self.videos_dir = os.path.join(storage_dir, "videos")
-        self.audio_dir = os.path.join(storage_dir, "temp")
+        # Narration is kept so a render-only regeneration can mux it again
+        self.audio_dir = os.path.join(storage_dir, "audio")
+        self.previews_dir = os.path.join(storage_dir, "previews")
         os.makedirs(self.videos_dir, exist_ok=True)
         os.makedirs(self.audio_dir, exist_ok=True)
+        os.makedirs(self.previews_dir, exist_ok=True)
+        self.preview_cache_size = int(os.getenv("TTS_PREVIEW_CACHE_SIZE") or 200)
+        # Least recently used first; rebuilt from disk so the cache survives restarts
+        self._previews = OrderedDict(
+            (name, None) for name in sorted(
+                (n for n in os.listdir(self.previews_dir) if n.endswith(".mp3")),
+                key=lambda n: os.path.getmtime(os.path.join(self.previews_dir, n))
+            )
+        )
+        self._preview_inflight: dict[str, asyncio.Task] = {}
 
-    async def generate_video(self, text: str, images: list[str], screenshots: list[str], task_id: str, voice: str | None = None):
+    async def generate_video(self, text: str, images: list[str], screenshots: list[str], task_id: str, voice: str | None = None, render: dict | None = None):
         try:
-            if not voice:
-                voice = "zh-CN-XiaoxiaoNeural" if any('\u4e00' <= ch <= '\u9fff' for ch in text) else "en-US-AriaNeural"
-            
-            audio_fallback = False
-            audio_path = os.path.join(self.audio_dir, f"{task_id}.mp3")
-            try:
-                communicate = edge_tts.Communicate(text, voice)
-                await communicate.save(audio_path)
-            except Exception as e:
-                print(f"TTS failed with voice {voice}: {e}")
-                audio_fallback = True
-                audio_path = os.path.join(self.audio_dir, f"{task_id}.wav")
-                duration_sec = max(6.0, min(120.0, len(text) / 14.0))
-                self._write_silence_wav(audio_path, duration_sec)
-            
-            # 2. Create Video using MoviePy
-            # For simplicity, we'll just show the screenshots in a loop or sequence
-            # matching the audio duration.
-            
-            # This part is synchronous CPU intensive, might block event loop.
-            # In production, run in a separate process or thread.
-            output_path = os.path.join(self.videos_dir, f"{task_id}.mp4")
-            
-            # Run moviepy logic in a separate thread/executor if possible, 
-            # but for MVP direct call is okay if not heavy load.
-            await asyncio.to_thread(self._create_moviepy_video, audio_path, images, screenshots, output_path)
+            speech = await self.synthesize_speech(text, task_id, voice=voice)
+            video_path = await self.render_video(speech["audio_path"], images, screenshots, task_id, render=render)
             return {
-                "video_path": output_path,
-                "voice": voice,
-                "audio_fallback": audio_fallback
+                "video_path": video_path,
+                "audio_path": speech["audio_path"],
+                "voice": speech["voice"],
+                "audio_fallback": speech["audio_fallback"]
             }
             
         except Exception as e:
             print(f"Video generation failed: {e}")
             raise e
+
+    async def synthesize_speech(self, text: str, task_id: str, voice: str | None = None):
+        if not voice:
+            voice = "zh-CN-XiaoxiaoNeural" if any('\u4e00' <= ch <= '\u9fff' for ch in text) else "en-US-AriaNeural"
+        
+        audio_fallback = False
+        task_audio_dir = shard_dir(self.audio_dir, task_id)
+        os.makedirs(task_audio_dir, exist_ok=True)
+        audio_path = os.path.join(task_audio_dir, f"{task_id}.mp3")
+        try:
+            import edge_tts
+            communicate = edge_tts.Communicate(text, voice)
+            await communicate.save(audio_path)
+        except Exception as e:
+            print(f"TTS failed with voice {voice}: {e}")
+            audio_fallback = True
+            self._discard(audio_path)
+            audio_path = os.path.join(task_audio_dir, f"{task_id}.wav")
+            duration_sec = max(6.0, min(120.0, len(text) / 14.0))
+            self._write_silence_wav(audio_path, duration_sec)
+        return {"audio_path": audio_path, "voice": voice, "audio_fallback": audio_fallback}
+
+    async def render_video(self, audio_path: str, images: list[str], screenshots: list[str], task_id: str, render: dict | None = None):
+        # Create Video using MoviePy
+        # For simplicity, we'll just show the screenshots in a loop or sequence
+        # matching the audio duration.
+        task_video_dir = shard_dir(self.videos_dir, task_id)
+        os.makedirs(task_video_dir, exist_ok=True)
+        output_path = os.path.join(task_video_dir, f"{task_id}.mp4")
+        
+        # The encode is CPU bound and runs in its own process so a cancelled
+        # or overdue task can kill it and get the core back immediately.
+        worker = multiprocessing.get_context("spawn").Process(
+            target=_render_worker,
+            args=(self.storage_dir, audio_path, images, screenshots, output_path, render),
+            daemon=True
+        )
+        worker.start()
+        try:
+            while worker.is_alive():
+                await asyncio.sleep(0.25)
+        except asyncio.CancelledError:
+            worker.terminate()
+            await asyncio.to_thread(worker.join, 5)
+            if worker.is_alive():
+                worker.kill()
+            self.discard_render_output(output_path)
+            raise
+        if worker.exitcode != 0:
+            self.discard_render_output(output_path)
+            raise RuntimeError(f"Render worker exited with code {worker.exitcode}")
+        return output_path
+
+    def discard_render_output(self, output_path: str):
+        self._discard(output_path)
+        self._discard(f"{output_path}.temp-audio.m4a")
     
+    async def warm_up_tts(self):
+        """Imports edge_tts ahead of the first synthesis."""
+        await asyncio.to_thread(self._import_tts)
+
+    async def warm_up(self):
+        """Checks that ffmpeg runs; returns the ffmpeg path."""
+        ffmpeg = await asyncio.to_thread(self._find_ffmpeg)
+        proc = await asyncio.create_subprocess_exec(
+            ffmpeg, "-version",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        if await proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg probe failed: {ffmpeg}")
+        return ffmpeg
+
+    def _import_tts(self):
+        import edge_tts  # noqa: F401
+
+    def _find_ffmpeg(self):
+        # moviepy renders through imageio-ffmpeg's binary when it is available
+        try:
+            from imageio_ffmpeg import get_ffmpeg_exe
+            return get_ffmpeg_exe()
+        except Exception:
+            pass
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg:
+            raise RuntimeError("ffmpeg not found")
+        return ffmpeg
+
     def get_available_voices(self):
         return [
             # Chinese Voices
@@ -83,17 +183,57 @@ class VideoGeneratorService:
             {"id": "en-AU-NatashaNeural", "name": "Natasha (Female - AU)", "lang": "en-AU"},
         ]
 
-    async def generate_preview(self, voice: str, text: str = "你好，这是一段试听文本。"):
-        preview_id = f"preview_{voice}"
-        preview_path = os.path.join(self.audio_dir, f"{preview_id}.mp3")
+    async def generate_preview(self, voice: str, text: str = DEFAULT_PREVIEW_TEXT):
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        name = f"{os.path.basename(voice)}_{text_hash}.mp3"
+        preview_path = os.path.join(self.previews_dir, name)
         
         # Only generate if doesn't exist to save resources
-        if not os.path.exists(preview_path):
-            communicate = edge_tts.Communicate(text, voice)
-            await communicate.save(preview_path)
-            
+        if name in self._previews and os.path.exists(preview_path):
+            self._previews.move_to_end(name)
+            return preview_path
+
+        # Concurrent first requests for the same preview share one synthesis
+        inflight = self._preview_inflight.get(name)
+        if inflight is None:
+            inflight = asyncio.create_task(self._synthesize_preview(voice, text, preview_path))
+            self._preview_inflight[name] = inflight
+            inflight.add_done_callback(lambda _: self._preview_inflight.pop(name, None))
+        await asyncio.shield(inflight)
+
+        self._previews[name] = None
+        self._previews.move_to_end(name)
+        while len(self._previews) > self.preview_cache_size:
+            evicted, _ = self._previews.popitem(last=False)
+            self._discard(os.path.join(self.previews_dir, evicted))
         return preview_path
 
+    async def prewarm_previews(self, concurrency: int = 3):
+        """Synthesizes the default preview of every voice so the picker plays instantly."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(voice_id: str):
+            async with semaphore:
+                try:
+                    await self.generate_preview(voice_id)
+                except Exception as e:
+                    print(f"Preview pre-warm failed for {voice_id}: {e}")
+
+        await asyncio.gather(*(warm(v["id"]) for v in self.get_available_voices()))
+
+    async def _synthesize_preview(self, voice: str, text: str, preview_path: str):
+        import edge_tts
+        tmp_path = f"{preview_path}.tmp"
+        communicate = edge_tts.Communicate(text, voice)
+        await communicate.save(tmp_path)
+        os.replace(tmp_path, preview_path)
+
+    def _discard(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
     def _write_silence_wav(self, audio_path: str, duration_sec: float, sample_rate: int = 22050):
         frames = int(duration_sec * sample_rate)
         with wave.open(audio_path, "wb") as wf:
@@ -102,44 +242,48 @@ class VideoGeneratorService:
             wf.setframerate(sample_rate)
             wf.writeframes(b"\x00\x00" * frames)
 
-    def _create_moviepy_video(self, audio_path, images, screenshots, output_path):
-        audio_clip = AudioFileClip(audio_path)
+    def _create_moviepy_video(self, audio_path, images, screenshots, output_path, render: dict | None = None):
+        render = {**DEFAULT_RENDER, **{k: v for k, v in (render or {}).items() if v}}
+        width, height, fps = render["width"], render["height"], render["fps"]
+        write_kwargs = {"fps": fps, "codec": "libx264", "audio_codec": "aac", "preset": render["preset"], "ffmpeg_params": FASTSTART_PARAMS, "temp_audiofile": f"{output_path}.temp-audio.m4a"}
+        mp = _moviepy()
+        audio_clip = mp.AudioFileClip(audio_path)
         duration = audio_clip.duration
         
         # Divide duration equally among screenshots
         visual_paths = images if images else screenshots
         if not visual_paths:
-            if ColorClip is None:
+            if mp.ColorClip is None:
                 raise ValueError("No visuals provided")
-            base = ColorClip(size=(1920, 1080), color=(15, 23, 42))
+            base = mp.ColorClip(size=(width, height), color=(15, 23, 42))
             base = self._set_duration(base, duration)
             final_video = self._set_audio(base, audio_clip)
-            final_video.write_videofile(output_path, fps=24, codec="libx264", audio_codec="aac")
+            final_video.write_videofile(output_path, **write_kwargs)
             return
             
         clip_duration = duration / len(visual_paths)
         
         clips = []
         for img_path in visual_paths:
-            clip = ImageClip(img_path)
-            clip = self._resize(clip, height=1080)
-            if clip.w < 1920:
-                clip = self._resize(clip, width=1920)
-            clip = self._crop(clip, width=1920, height=1080, x_center=clip.w / 2, y_center=clip.h / 2)
+            clip = mp.ImageClip(img_path)
+            clip = self._resize(clip, height=height)
+            if clip.w < width:
+                clip = self._resize(clip, width=width)
+            clip = self._crop(clip, width=width, height=height, x_center=clip.w / 2, y_center=clip.h / 2)
             clip = self._set_duration(clip, clip_duration)
             clips.append(clip)
 
-        if ConcatenateVideoClip is not None:
-            final_video = ConcatenateVideoClip(clips)
-        elif concatenate_videoclips is not None:
-            final_video = concatenate_videoclips(clips, method="compose")
+        if mp.ConcatenateVideoClip is not None:
+            final_video = mp.ConcatenateVideoClip(clips)
+        elif mp.concatenate_videoclips is not None:
+            final_video = mp.concatenate_videoclips(clips, method="compose")
         else:
             raise RuntimeError("No moviepy concatenation API available")
 
         final_video = self._set_audio(final_video, audio_clip)
         
         # Write file
-        final_video.write_videofile(output_path, fps=24, codec="libx264", audio_codec="aac")
+        final_video.write_videofile(output_path, **write_kwargs)
 
     def _resize(self, clip, **kwargs):
         if hasattr(clip, "resized"):
@@ -160,3 +304,6 @@ class VideoGeneratorService:
         if hasattr(video_clip, "with_audio"):
             return video_clip.with_audio(audio_clip)
         return video_clip.set_audio(audio_clip)
+
+def _render_worker(storage_dir, audio_path, images, screenshots, output_path, render):
+    VideoGeneratorService(storage_dir)._create_moviepy_video(audio_path, images, screenshots, output_path, render)
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import statistics
+import sys
+import time
+
+import requests
+
+PORT = int(os.getenv("BENCH_PORT") or 8765)
+BASE_URL = f"http://127.0.0.1:{PORT}"
+TEST_URL = os.getenv("BENCH_URL") or "https://example.com"
+IMPORT_RUNS = 5
+
+def measure_import_time():
+    """Median wall time of `import api.main` in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import api.main; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(IMPORT_RUNS):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def wait_for(path: str, started: float, timeout: float = 120):
+    while time.perf_counter() - started < timeout:
+        try:
+            if requests.get(f"{BASE_URL}{path}", timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{path} not ready after {timeout}s")
+
+def measure_server_start():
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(PORT)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        health = wait_for("/health", started)
+        ready = wait_for("/ready", started)
+
+        resp = requests.post(f"{BASE_URL}/api/process", json={"url": TEST_URL})
+        resp.raise_for_status()
+        task_id = resp.json()["task_id"]
+        first_task = None
+        while time.perf_counter() - started < 600:
+            status = requests.get(f"{BASE_URL}/api/status/{task_id}").json()["status"]
+            if status in ("completed", "failed", "cancelled"):
+                first_task = time.perf_counter() - started
+                break
+            time.sleep(0.5)
+        return health, ready, first_task, status
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    print("Measuring import time...")
+    import_time = measure_import_time()
+    print(f"import api.main (median of {IMPORT_RUNS}): {import_time * 1000:.0f} ms")
+
+    print(f"Starting server and submitting {TEST_URL}...")
+    health, ready, first_task, status = measure_server_start()
+    print(f"/health answering after: {health:.2f} s")
+    print(f"/ready answering after:  {ready:.2f} s")
+    if first_task is None:
+        print("First task did not finish within 600 s")
+        sys.exit(1)
+    print(f"First task {status} after: {first_task:.2f} s")
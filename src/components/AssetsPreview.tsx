@@ -1,6 +1,7 @@
 type AssetItem = {
   name: string;
   url: string;
+  thumb_url?: string;
 };
 
 export default function AssetsPreview({
@@ -25,7 +26,7 @@ export default function AssetsPreview({
       <div className="grid grid-cols-2 sm:grid-cols-3 gap-3">
         {items.map((item) => (
           <div key={item.url} className="relative rounded-lg overflow-hidden border border-gray-200 bg-gray-50">
-            <img src={item.url} alt={item.name} className="w-full h-32 object-cover" />
+            <img src={item.thumb_url || item.url} alt={item.name} loading="lazy" className="w-full h-32 object-cover" />
             <div className="absolute inset-x-0 bottom-0 bg-gradient-to-t from-black/60 to-transparent px-2 py-1">
               <div className="flex items-center justify-between gap-2">
                 <span className="text-xs text-white truncate">{item.name}</span>
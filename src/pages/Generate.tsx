@@ -7,9 +7,11 @@ import { useI18n } from '../i18n/i18n';
 import MarkdownPreview from '../components/MarkdownPreview';
 import AssetsPreview from '../components/AssetsPreview';
 
+const STATUS_FIELDS = 'status,progress,message,has_article,has_video,has_source,image_count,screenshot_count,visual_count';
+
 interface TaskStatus {
   task_id: string;
-  status: 'pending' | 'processing' | 'completed' | 'failed';
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled';
   progress: number;
   message: string;
   has_article: boolean;
@@ -53,10 +55,10 @@ export default function Generate() {
 
     const pollStatus = async () => {
       try {
-        const response = await axios.get(`/api/status/${taskId}`);
+        const response = await axios.get(`/api/status/${taskId}`, { params: { fields: STATUS_FIELDS } });
         setStatus(response.data);
         
-        if (response.data.status === 'completed' || response.data.status === 'failed') {
+        if (['completed', 'failed', 'cancelled'].includes(response.data.status)) {
           return true; // Stop polling
         }
         return false;